@@ -0,0 +1,112 @@
+"""
+Helpers shared by the Gradio demos: reading 'params' switches, the process pool
+used for decomposed solves (SOLVER_WORKERS processes, default one per CPU), the
+Excel reports directory and launching the app.
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import gradio as gr
+import pandas as pd
+
+# Excel reports are written here under unique names and removed once Gradio has copied them
+RESULTS_DIR = os.path.join(tempfile.gettempdir(), "demo_results")
+
+def read_param_flag(params, name):
+    """Interpret a 'params' value such as 1, TRUE or 'yes' as a boolean switch."""
+    value = params.get(name, 0)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+    if pd.isna(value):
+        return False
+    return bool(value)
+
+def solver_workers():
+    """Size of the process pool shared by all requests: SOLVER_WORKERS, or one worker per CPU."""
+    return max(1, int(os.environ.get('SOLVER_WORKERS', os.cpu_count() or 1)))
+
+def clamp_workers(requested):
+    """Jobs one request may run at once: a 'max_workers' param clamped to 1..solver_workers()."""
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError, OverflowError):
+        return solver_workers()  # Not set (NaN), infinite or not a number
+    return min(max(requested, 1), solver_workers())
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def get_process_pool():
+    """Process pool shared by all requests, sized by the server and not by any upload.
+    
+    Workers are started by a fork server (or spawned) instead of forking the
+    multi-threaded Gradio server and its whole address space.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _process_pool = ProcessPoolExecutor(
+                max_workers=solver_workers(), mp_context=multiprocessing.get_context(start_method)
+            )
+        return _process_pool
+
+def discard_process_pool(pool):
+    """Shut down a broken pool so that the next request starts a fresh one."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def map_in_process_pool(function, jobs, max_in_flight=None):
+    """Run function(*job) for every job in the shared pool and return the results in order.
+    
+    `jobs` is consumed lazily and at most `max_in_flight` jobs (default: the pool size)
+    are submitted at a time, so only their arguments are alive at once.
+    """
+    pool = get_process_pool()
+    max_in_flight = max_in_flight or solver_workers()
+    results = []
+    in_flight = deque()
+    try:
+        for job in jobs:
+            if len(in_flight) == max_in_flight:
+                results.append(in_flight.popleft().result())
+            in_flight.append(pool.submit(function, *job))
+        while in_flight:
+            results.append(in_flight.popleft().result())
+    except BrokenProcessPool:
+        # A worker died
+        discard_process_pool(pool)
+        raise
+    return results
+
+def results_path(prefix):
+    """A new, uniquely named .xlsx file in RESULTS_DIR, so concurrent users never overwrite each other's results."""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=".xlsx", dir=RESULTS_DIR)
+    os.close(fd)
+    return path
+
+def remove_results_file(results_file):
+    """Delete the written report; Gradio has copied it into its own cache by the time the handler ends."""
+    if results_file.exception() is None:
+        os.remove(results_file.result())
+
+def launch(demo):
+    """Launch an app, serving several requests at once (gradio 3.x would otherwise run one at a time).
+    
+    GRADIO_CONCURRENCY overrides the default of one concurrent request per CPU.
+    """
+    concurrency = int(os.environ.get('GRADIO_CONCURRENCY', os.cpu_count() or 1))
+    if int(gr.__version__.split('.')[0]) < 4:
+        demo.queue(concurrency_count=concurrency)
+    else:
+        demo.queue(default_concurrency_limit=concurrency)
+    demo.launch()
@@ -0,0 +1,184 @@
+"""
+Shared instance store for multi-worker deployments of the demos.
+
+Parsed matrices (the SCP coverage matrix as CSR arrays, the scheduling cost matrix
+as a float32 array) are written once as .npy files under a store directory and
+keyed by a content hash of the uploaded workbook. Every worker process memory-maps
+the same files read-only, so the OS keeps a single physical copy no matter how many
+workers use the instance. With the store on /dev/shm (RAM-backed on Linux) this is
+plain shared memory.
+
+Reference counting: each attachment registers a ref file (named after the pid) in
+the entry, removed once the mapped arrays and every view of them are garbage
+collected; refs of dead processes are ignored. When the store grows past its
+capacity, entries without live references are evicted, least recently used first.
+
+Enable it by setting INSTANCE_STORE_DIR (e.g. /dev/shm/analytics_instances) and
+optionally INSTANCE_STORE_CAPACITY_MB (default 1024). The store needs Unix file locks;
+elsewhere it stays disabled and every request parses its own upload.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import uuid
+import weakref
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: no file locks, so the store stays disabled
+
+import numpy as np
+
+DEFAULT_CAPACITY_MB = 1024
+
+@functools.lru_cache(maxsize=None)
+def default_instance_store():
+    """The store configured by INSTANCE_STORE_DIR, or None when sharing is disabled or unsupported."""
+    root = os.environ.get('INSTANCE_STORE_DIR')
+    if not root or fcntl is None:
+        return None
+    capacity_mb = float(os.environ.get('INSTANCE_STORE_CAPACITY_MB', DEFAULT_CAPACITY_MB))
+    return InstanceStore(root, capacity_mb)
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Alive, but owned by another user
+    return True
+
+def directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, names in os.walk(path)
+        for name in names
+    )
+
+def load_mapped(path):
+    """Memory-map a stored array read-only (empty arrays cannot be mapped and are just loaded)."""
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)
+
+def release_reference(remaining, ref_path):
+    """Finalizer of a mapped array: drop the ref file once all arrays of an attachment are gone."""
+    remaining[0] -= 1
+    if remaining[0] == 0:
+        try:
+            os.remove(ref_path)
+        except FileNotFoundError:
+            pass
+
+class InstanceStore:
+    """Directory of memory-mapped instances shared by every process on the host."""
+    
+    def __init__(self, root, capacity_mb=DEFAULT_CAPACITY_MB):
+        self.root = root
+        self.capacity_mb = capacity_mb
+        os.makedirs(os.path.join(root, '.locks'), exist_ok=True)
+    
+    @contextmanager
+    def lock(self, name, blocking=True):
+        """Exclusive inter-process lock; raises BlockingIOError when not blocking and busy."""
+        with open(os.path.join(self.root, '.locks', f"{name}.lock"), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def key_for(self, source, *parts):
+        """Content hash of an uploaded file (path or object with a .name), plus extra parts such as a sheet name."""
+        digest = hashlib.sha256()
+        with open(getattr(source, 'name', source), 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        for part in parts:
+            digest.update(str(part).encode())
+        return digest.hexdigest()
+    
+    def entries(self):
+        return [name for name in os.listdir(self.root) if not name.startswith('.')]
+    
+    def live_references(self, key):
+        """Number of live attachments of an entry; refs left by dead processes are removed."""
+        refs_dir = os.path.join(self.root, key, 'refs')
+        live = 0
+        for ref in os.listdir(refs_dir):
+            if pid_alive(int(ref.split('-')[0])):
+                live += 1
+            else:
+                os.remove(os.path.join(refs_dir, ref))
+        return live
+    
+    def publish(self, key, arrays, meta):
+        """Write an entry to a temporary directory, then rename it into place atomically."""
+        temp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(os.path.join(temp_dir, 'refs'))
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(temp_dir, 'meta.pkl'), 'wb') as meta_file:
+            pickle.dump(meta, meta_file)
+        os.rename(temp_dir, os.path.join(self.root, key))
+    
+    def attach(self, key, loader=None):
+        """Attach to an instance, parsing and publishing it with `loader` on first use.
+        
+        `loader()` returns ({name: numpy array}, picklable metadata such as labels).
+        Returns the same pair, with the arrays memory-mapped read-only. The reference
+        is held as long as any of the arrays, or a view of them, is alive. Without a
+        loader (worker processes of a request that holds the instance) the entry must exist.
+        """
+        entry_dir = os.path.join(self.root, key)
+        with self.lock(key):
+            if not os.path.isdir(entry_dir):
+                if loader is None:
+                    raise KeyError(f"Instance {key} is not in the store")
+                self.publish(key, *loader())
+        
+            ref_path = os.path.join(entry_dir, 'refs', f"{os.getpid()}-{uuid.uuid4().hex}")
+            open(ref_path, 'w').close()
+            os.utime(entry_dir)  # Last use, for LRU eviction
+        
+            arrays = {
+                name[:-len('.npy')]: load_mapped(os.path.join(entry_dir, name))
+                for name in os.listdir(entry_dir) if name.endswith('.npy')
+            }
+            with open(os.path.join(entry_dir, 'meta.pkl'), 'rb') as meta_file:
+                meta = pickle.load(meta_file)
+        
+        remaining = [len(arrays)]
+        for array in arrays.values():
+            weakref.finalize(array, release_reference, remaining, ref_path)
+        if not arrays:
+            release_reference([1], ref_path)
+        
+        self.evict()
+        return arrays, meta
+    
+    def evict(self):
+        """Remove unreferenced entries, least recently used first, until the store fits its capacity."""
+        with self.lock('.evict'):
+            sizes = {key: directory_size(os.path.join(self.root, key)) for key in self.entries()}
+            total_mb = sum(sizes.values()) / 1024 ** 2
+            by_last_use = sorted(sizes, key=lambda key: os.path.getmtime(os.path.join(self.root, key)))
+            for key in by_last_use:
+                if total_mb <= self.capacity_mb:
+                    break
+                try:
+                    # Skip entries another process is attaching to right now
+                    with self.lock(key, blocking=False):
+                        if self.live_references(key) > 0:
+                            continue
+                        # Processes that still map the files keep them until they unmap
+                        shutil.rmtree(os.path.join(self.root, key))
+                        total_mb -= sizes[key] / 1024 ** 2
+                except BlockingIOError:
+                    continue
@@ -0,0 +1,312 @@
+"""
+Local load-testing harness for the Gradio demos (PPC, SCP and Shift Scheduling).
+
+Starts each app as a local server, generates a mix of workbooks of different sizes,
+replays them against the apps' `/solve` API endpoints at a configurable concurrency,
+and reports per endpoint:
+- throughput (requests per second) and error rate
+- p50/p95/p99 latency
+- server memory over time: the PSS (proportional set size) of the server and its worker
+  processes, so pages they share, such as the mapped instance store, are counted once
+
+Example:
+    python loadtest.py --apps ppc scp scheduling --concurrency 8 --requests 40
+"""
+import argparse
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from gradio_client import Client
+
+try:
+    # gradio_client >= 1.0 wants uploaded files wrapped
+    from gradio_client import handle_file
+except ImportError:
+    def handle_file(path):
+        return path
+
+APPS = {
+    'ppc': 'ppc.py',
+    'scp': 'scp.py',
+    'scheduling': 'scheduling.py',
+}
+
+# Instance sizes replayed for each app
+SIZES = {
+    'small': {'ppc': 10, 'scp': (20, 50), 'scheduling': (15, 4)},
+    'medium': {'ppc': 200, 'scp': (100, 400), 'scheduling': (60, 6)},
+    'large': {'ppc': 2000, 'scp': (300, 1500), 'scheduling': (200, 8)},
+}
+
+def params_sheet(params):
+    return pd.DataFrame({'name': list(params), 'val': list(params.values())})
+
+def generate_ppc_workbook(path, num_products, rng):
+    data_df = pd.DataFrame({
+        'revenue': rng.uniform(20, 50, num_products).round(2),
+        'cost': rng.uniform(5, 20, num_products).round(2),
+        'production_capacity': rng.integers(50, 200, num_products),
+    }, index=pd.RangeIndex(1, num_products + 1, name='product'))
+    params = {
+        'num_products': num_products,
+        'budget': float((data_df['cost'] * data_df['production_capacity']).sum() / 3),
+        'capacity': int(data_df['production_capacity'].sum() / 2),
+    }
+    with pd.ExcelWriter(path) as writer:
+        data_df.to_excel(writer, sheet_name='data')
+        params_sheet(params).to_excel(writer, sheet_name='params', index=False)
+
+def generate_scp_workbook(path, num_sets, num_elements, rng):
+    set_ids = [f"S{i + 1}" for i in range(num_sets)]
+    element_ids = [f"E{j + 1}" for j in range(num_elements)]
+    sources_df = pd.DataFrame({
+        'cost': rng.integers(10, 100, num_sets),
+        'x': rng.uniform(0, 100, num_sets).round(2),
+        'y': rng.uniform(0, 100, num_sets).round(2),
+    }, index=pd.Index(set_ids, name='set'))
+    dests_df = pd.DataFrame({
+        'x': rng.uniform(0, 100, num_elements).round(2),
+        'y': rng.uniform(0, 100, num_elements).round(2),
+    }, index=pd.Index(element_ids, name='name'))
+    
+    # A set covers the elements within a radius; the nearest set always covers
+    # an element so every instance is feasible
+    distances = np.hypot(
+        sources_df['x'].to_numpy()[:, None] - dests_df['x'].to_numpy()[None, :],
+        sources_df['y'].to_numpy()[:, None] - dests_df['y'].to_numpy()[None, :],
+    )
+    coverage = (distances <= 100 / np.sqrt(num_sets) * 1.5).astype(int)
+    coverage[distances.argmin(axis=0), np.arange(num_elements)] = 1
+    coverage_df = pd.DataFrame(coverage, index=pd.Index(set_ids, name='set'), columns=element_ids)
+    
+    with pd.ExcelWriter(path) as writer:
+        params_sheet({}).to_excel(writer, sheet_name='params', index=False)
+        sources_df.to_excel(writer, sheet_name='sources')
+        dests_df.to_excel(writer, sheet_name='dests')
+        coverage_df.to_excel(writer, sheet_name='coverage')
+
+def generate_scheduling_workbook(path, num_employees, num_shifts, rng):
+    employee_ids = [f"E{i + 1:03d}" for i in range(num_employees)]
+    shift_ids = [f"Shift{j + 1}" for j in range(num_shifts)]
+    employees_df = pd.DataFrame({
+        'name': [f"Employee {i + 1}" for i in range(num_employees)],
+        'role': rng.choice(['Junior', 'Senior', 'Lead'], num_employees),
+    }, index=pd.Index(employee_ids, name='id'))
+    
+    # Staffing bounds that always leave room for every employee
+    start_times = np.arange(num_shifts) * (24 // num_shifts)
+    min_staff = np.full(num_shifts, max(num_employees // (2 * num_shifts), 1))
+    shifts_df = pd.DataFrame({
+        'start_time': start_times,
+        'end_time': (start_times + 8) % 24,
+        'min_staff': min_staff,
+        'max_staff': np.full(num_shifts, num_employees),
+    }, index=pd.Index(shift_ids, name='id'))
+    costs_df = pd.DataFrame(
+        rng.integers(50, 150, (num_employees, num_shifts)),
+        index=pd.Index(employee_ids, name='id'), columns=shift_ids,
+    )
+    
+    with pd.ExcelWriter(path) as writer:
+        params_sheet({}).to_excel(writer, sheet_name='params', index=False)
+        employees_df.to_excel(writer, sheet_name='employees')
+        shifts_df.to_excel(writer, sheet_name='shifts')
+        costs_df.to_excel(writer, sheet_name='costs')
+
+def generate_workbooks(apps, sizes, workdir, seed):
+    """Generate one workbook per app and size; returns {app: [(size, path)]}."""
+    rng = np.random.default_rng(seed)
+    workbooks = {app: [] for app in apps}
+    for app in apps:
+        for size in sizes:
+            path = os.path.join(workdir, f"{app}_{size}.xlsx")
+            spec = SIZES[size][app]
+            if app == 'ppc':
+                generate_ppc_workbook(path, spec, rng)
+            elif app == 'scp':
+                generate_scp_workbook(path, *spec, rng)
+            else:
+                generate_scheduling_workbook(path, *spec, rng)
+            workbooks[app].append((size, path))
+    return workbooks
+
+def start_app(app, port, workdir, timeout=120):
+    """Launch an app on a local port and wait until it answers HTTP requests."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), APPS[app])
+    env = dict(os.environ, GRADIO_SERVER_PORT=str(port), GRADIO_ANALYTICS_ENABLED='False')
+    log_path = os.path.join(workdir, f"{app}_server.log")
+    with open(log_path, 'w') as log_file:
+        # The server writes to its own copy of the descriptor, so ours can be closed right away
+        process = subprocess.Popen(
+            [sys.executable, script], cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT
+        )
+    
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{app} exited with code {process.returncode}, see {log_path}")
+        try:
+            urllib.request.urlopen(url, timeout=2)
+            return process, url
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"{app} did not start on port {port} within {timeout}s")
+
+def process_tree_pss_mb(pid):
+    """PSS of a process and all its descendants in MB, from /proc (Linux).
+    
+    Unlike summing RSS, shared pages are split between the processes sharing them,
+    so the total does not grow just because more workers map the same files.
+    """
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as smaps:
+                for line in smaps:
+                    if line.startswith('Pss:'):
+                        total_kb += int(line.split()[1])
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    pending.extend(int(child) for child in children.read().split())
+        except (OSError, ValueError):
+            continue  # The process exited while we were reading it
+    return total_kb / 1024
+
+def sample_memory(servers, samples, stop, interval):
+    """Record (elapsed seconds, app, PSS MB) for every server until `stop` is set."""
+    start_time = time.perf_counter()
+    while not stop.is_set():
+        elapsed = time.perf_counter() - start_time
+        for app, (process, _) in servers.items():
+            samples.append((elapsed, app, process_tree_pss_mb(process.pid)))
+        stop.wait(interval)
+
+def connect_clients(servers, concurrency):
+    """Connect `concurrency` clients per app up front, since a Client fetches the app config when created."""
+    idle_clients = {}
+    for app, (_, url) in servers.items():
+        idle_clients[app] = queue.Queue()
+        for _ in range(concurrency):
+            idle_clients[app].put(Client(url, verbose=False))
+    return idle_clients
+
+def run_load(idle_clients, workbooks, num_requests, concurrency, seed):
+    """Replay a shuffled mix of requests with already connected clients; returns one record per request."""
+    rng = random.Random(seed)
+    plan = [
+        (app, *rng.choice(workbooks[app]))
+        for app in idle_clients
+        for _ in range(num_requests)
+    ]
+    rng.shuffle(plan)
+    
+    def send(app, size, path):
+        client = idle_clients[app].get()
+        start_time = time.perf_counter()
+        try:
+            client.predict(handle_file(path), api_name='/solve')
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            idle_clients[app].put(client)
+        return {
+            'app': app,
+            'size': size,
+            'start': start_time,
+            'latency': time.perf_counter() - start_time,
+            'error': error,
+        }
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda request: send(*request), plan))
+
+def summarize(records, samples, wall_time):
+    """Per-endpoint throughput, latency percentiles, error rate and memory."""
+    records_df = pd.DataFrame(records)
+    memory_df = pd.DataFrame(samples, columns=['elapsed', 'app', 'pss_mb'])
+    rows = []
+    for app, app_records in records_df.groupby('app'):
+        ok = app_records[app_records['error'].isna()]
+        latencies = ok['latency'].to_numpy()
+        app_memory = memory_df.loc[memory_df['app'] == app, 'pss_mb']
+        rows.append({
+            'endpoint': f"{app}/solve",
+            'requests': len(app_records),
+            'errors': len(app_records) - len(ok),
+            'error_rate': 1 - len(ok) / len(app_records),
+            'throughput_rps': len(ok) / wall_time,
+            'p50_s': np.percentile(latencies, 50) if len(latencies) else np.nan,
+            'p95_s': np.percentile(latencies, 95) if len(latencies) else np.nan,
+            'p99_s': np.percentile(latencies, 99) if len(latencies) else np.nan,
+            'pss_start_mb': app_memory.iloc[0] if len(app_memory) else np.nan,
+            'pss_peak_mb': app_memory.max() if len(app_memory) else np.nan,
+        })
+    return pd.DataFrame(rows), records_df, memory_df
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--apps', nargs='+', choices=list(APPS), default=list(APPS))
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+    parser.add_argument('--concurrency', type=int, default=4, help="concurrent clients")
+    parser.add_argument('--requests', type=int, default=20, help="requests per endpoint")
+    parser.add_argument('--port', type=int, default=7860, help="first local port, one per app")
+    parser.add_argument('--memory-interval', type=float, default=0.5, help="seconds between memory samples")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="directory for the CSV reports (default: the work directory)")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='gradio_loadtest_')
+    output_dir = args.output or workdir
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Work directory: {workdir}")
+    
+    workbooks = generate_workbooks(args.apps, args.sizes, workdir, args.seed)
+    servers = {}
+    samples = []
+    stop = threading.Event()
+    try:
+        for offset, app in enumerate(args.apps):
+            servers[app] = start_app(app, args.port + offset, workdir)
+            print(f"Started {app} at {servers[app][1]}")
+    
+        sampler = threading.Thread(target=sample_memory, args=(servers, samples, stop, args.memory_interval), daemon=True)
+        sampler.start()
+        idle_clients = connect_clients(servers, args.concurrency)
+        start_time = time.perf_counter()
+        records = run_load(idle_clients, workbooks, args.requests, args.concurrency, args.seed)
+        wall_time = time.perf_counter() - start_time
+    finally:
+        stop.set()
+        for process, _ in servers.values():
+            process.terminate()
+        for process, _ in servers.values():
+            process.wait()
+    
+    summary_df, records_df, memory_df = summarize(records, samples, wall_time)
+    summary_df.to_csv(os.path.join(output_dir, 'summary.csv'), index=False)
+    records_df.to_csv(os.path.join(output_dir, 'requests.csv'), index=False)
+    memory_df.to_csv(os.path.join(output_dir, 'memory.csv'), index=False)
+    
+    print(f"\n{len(records)} requests in {wall_time:.1f}s at concurrency {args.concurrency}\n")
+    print(summary_df.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    for error in records_df['error'].dropna().unique()[:5]:
+        print(f"Error: {error}")
+    print(f"\nReports written to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,15 @@ Code and prototype available at Hugging Face: https://huggingface.co/spaces/mans
 import numpy as np
 import pandas as pd
 import pyomo.environ as pyo
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import gradio as gr
 import io
 import os
+from concurrent.futures import ThreadPoolExecutor
+from demo_common import launch, remove_results_file, results_path
 
-def solve_production_model(excel_file):
+def optimize_production(excel_file):
+    """Solve the uploaded instance; return the results text and the results table."""
 
     # Read data from the uploaded Excel file
     df = pd.read_excel(excel_file, sheet_name='data', index_col=0).to_dict()
@@ -87,12 +90,30 @@ def solve_production_model(excel_file):
         output_text += f"Product {i}: {model.x[i]()}\n"
 
     
+    # Create Excel report - keep all the columns for the Excel output
+    results_df = pd.DataFrame({
+        "Product": list(model.I),
+        "Production Quantity": [model.x[i]() for i in model.I],
+        "Unit Revenue": [model.r[i] for i in model.I],
+        "Unit Cost": [model.c[i] for i in model.I],
+        "Total Profit": [(model.r[i] - model.c[i]) * pyo.value(model.x[i]) for i in model.I]
+    })
+    
+    return output_text, results_df
+
+def create_production_visualization(results_df):
+    """Create a bar chart of the optimal production quantities.
+    
+    Uses a standalone Figure rather than pyplot, whose global state is not safe to share
+    between concurrent handlers and keeps every figure alive until it is closed.
+    """
     # Create simplified visualization - just the production quantities
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
     
     # Bar chart of production quantities
-    products = [f"Product {i}" for i in model.I]
-    quantities = [pyo.value(model.x[i]) for i in model.I]
+    products = [f"Product {i}" for i in results_df["Product"]]
+    quantities = results_df["Production Quantity"].tolist()
     ax.bar(products, quantities)
     ax.set_title('Optimal Production Quantities')
     ax.set_ylabel('Quantity')
@@ -110,26 +131,36 @@ def solve_production_model(excel_file):
         # Set the visible ticks and labels
         ax.set_xticks([i for i in keep_indices])
         ax.set_xticklabels(keep_labels)
-        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-    elif len(products) > 5:
-        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-    
-    plt.tight_layout()
+    if len(products) > 5:
+        for label in ax.get_xticklabels():
+            label.set(rotation=45, ha='right')
     
-    # Create Excel report - keep all the columns for the Excel output
-    results_df = pd.DataFrame({
-        "Product": list(model.I),
-        "Production Quantity": [model.x[i]() for i in model.I],
-        "Unit Revenue": [model.r[i] for i in model.I],
-        "Unit Cost": [model.c[i] for i in model.I],
-        "Total Profit": [(model.r[i] - model.c[i]) * pyo.value(model.x[i]) for i in model.I]
-    })
+    fig.tight_layout()
     
-    # Save to in-memory bytes buffer
-    temp_file_path = "optimization_results.xlsx"
+    return fig
+
+def write_production_results(results_df):
+    """Write the Excel report and return its path."""
+    # Save to a uniquely named file in the shared results directory
+    temp_file_path = results_path("optimization_results")
     results_df.to_excel(temp_file_path, index=False)
     
-    return output_text, fig, temp_file_path
+    return temp_file_path
+
+def solve_production_model(excel_file):
+    """Gradio handler: yield the results text as soon as the solve returns, then the chart, then the Excel report."""
+    output_text, results_df = optimize_production(excel_file)
+    yield output_text, None, None
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Write the Excel report while the chart is being drawn
+        results_file = executor.submit(write_production_results, results_df)
+        try:
+            fig = create_production_visualization(results_df)
+            yield output_text, fig, None
+            yield output_text, fig, results_file.result()
+        finally:
+            remove_results_file(results_file)
     
 # Create Gradio interface
 with gr.Blocks(title="Data Driven PPC") as demo:
@@ -154,9 +185,10 @@ with gr.Blocks(title="Data Driven PPC") as demo:
     submit_btn.click(
         solve_production_model,
         inputs=[input_file],
-        outputs=[output_text, output_plot, output_file]
+        outputs=[output_text, output_plot, output_file],
+        api_name="solve"
     )
 
 # Launch the app
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    launch(demo)
\ No newline at end of file
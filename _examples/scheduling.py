@@ -9,8 +9,16 @@ import plotly.graph_objects as go
 import plotly.express as px
 import gradio as gr
 import io
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from demo_common import clamp_workers, launch, map_in_process_pool, read_param_flag, remove_results_file, results_path
+from instance_store import default_instance_store
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from streaming_reader import is_large_upload, read_dense_costs
 
 """
 Shift Scheduling Problem Mathematical Formulation:
@@ -30,10 +38,35 @@ Where:
 The objective is to minimize the total assignment cost while meeting staffing requirements.
 """
 
-def solve_shift_scheduling_model(excel_file):
+def read_shift_scheduling_data(excel_file):
     # Read data from the uploaded Excel file
-    # 'costs' sheet contains the cost matrix for assigning employees to shifts
-    costs_df = pd.read_excel(excel_file, sheet_name='costs', index_col=0)
+    # 'params' sheet contains general parameters (optional)
+    try:
+        params = pd.read_excel(excel_file, sheet_name='params').to_dict(orient='list')
+        params = {name_: value_ for name_, value_ in zip(params["name"], params["val"])}
+    except:
+        params = {}
+    
+    # 'costs' sheet contains the cost matrix for assigning employees to shifts;
+    # costs_info records the peak size of the reader's buffers ('read_memory_mb', None when
+    # not streamed) and the instance store key of the matrix ('store_key', None without a store)
+    costs_info = {'read_memory_mb': None, 'store_key': None}
+    store = default_instance_store()
+    if store is not None:
+        # Multi-worker deployments parse each workbook once and share the matrix (always
+        # streamed, so float32); the DataFrame wraps the read-only memory map without copying it
+        def load_costs():
+            costs, employee_ids, shift_ids, costs_info['read_memory_mb'] = read_dense_costs(excel_file, 'costs')
+            return {'costs': costs}, {'employee_ids': employee_ids, 'shift_ids': shift_ids}
+        costs_info['store_key'] = store.key_for(excel_file, 'costs')
+        arrays, labels = store.attach(costs_info['store_key'], load_costs)
+        costs_df = pd.DataFrame(arrays['costs'], index=labels['employee_ids'], columns=labels['shift_ids'], copy=False)
+    elif read_param_flag(params, 'stream_matrices') or is_large_upload(excel_file):
+        # Stream large uploads row by row into a float32 array
+        costs, employee_ids, shift_ids, costs_info['read_memory_mb'] = read_dense_costs(excel_file, 'costs')
+        costs_df = pd.DataFrame(costs, index=employee_ids, columns=shift_ids, copy=False)
+    else:
+        costs_df = pd.read_excel(excel_file, sheet_name='costs', index_col=0)
     
     # 'employees' sheet contains information about employees
     employees_df = pd.read_excel(excel_file, sheet_name='employees', index_col=0)
@@ -41,13 +74,17 @@ def solve_shift_scheduling_model(excel_file):
     # 'shifts' sheet contains information about shifts
     shifts_df = pd.read_excel(excel_file, sheet_name='shifts', index_col=0)
     
-    # 'params' sheet contains general parameters (optional)
-    try:
-        params = pd.read_excel(excel_file, sheet_name='params').to_dict(orient='list')
-        params = {name_: value_ for name_, value_ in zip(params["name"], params["val"])}
-    except:
-        params = {}
+    # 'preferences' sheet contains the preference matrix (optional, 1 = preferred, 0 = not preferred)
+    prefs_df = None
+    if 'preferences' in params.get('include', []):
+        try:
+            prefs_df = pd.read_excel(excel_file, sheet_name='preferences', index_col=0)
+        except:
+            pass  # If preferences sheet doesn't exist, skip this constraint
     
+    return costs_df, employees_df, shifts_df, params, prefs_df, costs_info
+
+def build_shift_scheduling_model(costs_df, employees_df, shifts_df, params, prefs_df=None):
     # Initialize the model
     model = pyo.ConcreteModel()
     
@@ -93,11 +130,8 @@ def solve_shift_scheduling_model(excel_file):
         model.max_staff_constraint = pyo.Constraint(model.J, rule=max_staff_constraint)
     
     # Optional: Employee preferences constraint (if preference matrix is given)
-    if 'preferences' in params.get('include', []):
+    if prefs_df is not None:
         try:
-            # Read preference matrix (1 = preferred, 0 = not preferred)
-            prefs_df = pd.read_excel(excel_file, sheet_name='preferences', index_col=0)
-            
             # Define minimum preferred shifts parameter
             min_preferred = params.get('min_preferred_pct', 0)
             
@@ -110,38 +144,379 @@ def solve_shift_scheduling_model(excel_file):
             
             model.preference_constraint = pyo.Constraint(model.I, rule=preference_constraint)
         except:
-            pass  # If preferences sheet doesn't exist, skip this constraint
+            pass  # If the preference matrix doesn't match the employees and shifts, skip this constraint
     
-    # Solve the model using GLPK
-    result = None
-    solver_error = None
+    return model
+
+def group_identical_employees(costs_df, prefs_df=None):
+    """Group employees whose 'costs' rows (and preferred shifts, if any) are identical.
+    
+    Returns {representative_id: [member_ids]}, the representative being the first member.
+    """
+    rows = costs_df
+    if prefs_df is not None:
+        rows = pd.concat([costs_df, (prefs_df == 1).add_prefix('preferred_')], axis=1)
+    groups = rows.groupby(list(rows.columns), dropna=False, sort=False).groups
+    classes = {members[0]: members.tolist() for members in groups.values()}
+    # Keep the employee order of the input for readable, reproducible assignments
+    return {k: classes[k] for k in costs_df.index if k in classes}
+
+def build_aggregated_shift_scheduling_model(classes, costs_df, shifts_df, params, prefs_df=None):
+    """Scheduling MIP over classes of identical employees instead of individuals.
+    
+    y_kj counts the members of class k assigned to shift j, which removes the
+    symmetry between interchangeable employees.
+    """
+    # Initialize the model
+    model = pyo.ConcreteModel()
+    
+    # Define the sets
+    model.K = pyo.Set(initialize=list(classes))  # Employee classes (by representative)
+    model.J = pyo.Set(initialize=shifts_df.index.tolist())  # Shifts
+    
+    # n_k: number of employees in class k
+    model.n = pyo.Param(model.K, initialize={k: len(members) for k, members in classes.items()})
     
+    # Define the decision variables
+    # y_kj: number of employees of class k assigned to shift j
+    def y_bounds(model, k, j):
+        return (0, model.n[k])
+    model.y = pyo.Var(model.K, model.J, domain=pyo.NonNegativeIntegers, bounds=y_bounds)
+    
+    # Define the parameters
+    # c_kj: cost of assigning any employee of class k to shift j
+    def c_init(model, k, j):
+        return costs_df.loc[k, j]
+    model.c = pyo.Param(model.K, model.J, initialize=c_init)
+    
+    # r_j: minimum staff required for shift j
+    def r_init(model, j):
+        return shifts_df.loc[j, 'min_staff']
+    model.r = pyo.Param(model.J, initialize=r_init)
+    
+    # Define the objective function (minimize total assignment cost)
+    def obj_rule(model):
+        return sum(model.c[k, j] * model.y[k, j] for k in model.K for j in model.J)
+    model.obj = pyo.Objective(rule=obj_rule, sense=pyo.minimize)
+    
+    # Define the constraints
+    # Every employee of a class is assigned to exactly one shift
+    def class_size_constraint(model, k):
+        return sum(model.y[k, j] for j in model.J) == model.n[k]
+    model.class_size_constraint = pyo.Constraint(model.K, rule=class_size_constraint)
+    
+    # Each shift meets minimum staffing requirements
+    def minimum_staff_constraint(model, j):
+        return sum(model.y[k, j] for k in model.K) >= model.r[j]
+    model.min_staff_constraint = pyo.Constraint(model.J, rule=minimum_staff_constraint)
+    
+    # Optional: maximum staff per shift constraint (if specified in shifts dataframe)
+    if 'max_staff' in shifts_df.columns:
+        def max_staff_constraint(model, j):
+            return sum(model.y[k, j] for k in model.K) <= shifts_df.loc[j, 'max_staff']
+        model.max_staff_constraint = pyo.Constraint(model.J, rule=max_staff_constraint)
+    
+    # Optional: Employee preferences constraint (if preference matrix is given)
+    if prefs_df is not None:
+        try:
+            # Each employee works exactly one shift, so "at least min_preferred preferred
+            # shifts" holds per member iff it holds with min_preferred rounded up, and
+            # then it holds for every member iff it holds n_k times for the class
+            min_preferred = math.ceil(params.get('min_preferred_pct', 0))
+            
+            def preference_constraint(model, k):
+                preferred_shifts = [j for j in model.J if prefs_df.loc[k, j] == 1]
+                if not preferred_shifts:  # Skip if the class has no preferences
+                    return pyo.Constraint.Skip
+                return sum(model.y[k, j] for j in preferred_shifts) >= model.n[k] * min_preferred
+            
+            model.preference_constraint = pyo.Constraint(model.K, rule=preference_constraint)
+        except:
+            pass  # If the preference matrix doesn't match the employees and shifts, skip this constraint
+    
+    return model
+
+def disaggregate_assignments(model, classes):
+    """Turn per-class shift counts back into one shift per employee."""
+    assignments = {}
+    for k, members in classes.items():
+        slots = [j for j in model.J for _ in range(int(round(model.y[k, j].value or 0)))]
+        assignments.update(zip(members, slots))
+    return assignments
+
+def solve_shift_scheduling_block(block_id, costs_df, employees_df, shifts_df, params, prefs_df=None, tee=False):
+    """Solve the scheduling MIP restricted to one block of employees and shifts.
+    
+    Returns a plain dict (picklable) so blocks can be solved in worker processes.
+    """
+    start_time = time.perf_counter()
+    block_result = {
+        'Block': block_id,
+        'Employees': len(employees_df),
+        'Shifts': len(shifts_df),
+        'Status': 'ok',
+        'Termination': 'optimal',
+        'Objective': 0.0,
+        'Solve_Time': 0.0,
+        'Classes': len(employees_df),
+        'assignments': {},
+    }
+    
+    # A block without employees or shifts has nothing to optimize: it is only
+    # feasible if nobody needs a shift and no shift needs staff
+    if len(employees_df) == 0 or len(shifts_df) == 0:
+        if len(employees_df) > 0 or (shifts_df['min_staff'] > 0).any():
+            block_result['Termination'] = 'infeasible'
+            block_result['Objective'] = None
+        return block_result
+    
+    # Optional: solve over classes of identical employees to break symmetry
+    aggregate = read_param_flag(params, 'aggregate_employees')
+    if aggregate:
+        classes = group_identical_employees(costs_df, prefs_df)
+        block_result['Classes'] = len(classes)
+        model = build_aggregated_shift_scheduling_model(classes, costs_df, shifts_df, params, prefs_df)
+    else:
+        model = build_shift_scheduling_model(costs_df, employees_df, shifts_df, params, prefs_df)
+    
+    # Solve the model using GLPK
     try:
-        # Use GLPK as the primary solver
         solver = pyo.SolverFactory('glpk')
         if solver.available():
-            result = solver.solve(model, tee=True)
-            output_text = "Using solver: GLPK\n\n"
+            result = solver.solve(model, tee=tee)
         else:
             raise Exception("GLPK solver is not available")
     except Exception as e:
-        solver_error = str(e)
-        raise Exception(f"Failed to solve with GLPK: {solver_error}")
+        raise Exception(f"Failed to solve with GLPK: {str(e)}")
+    
+    block_result['Status'] = str(result.solver.status)
+    block_result['Termination'] = str(result.solver.termination_condition)
+    block_result['Objective'] = pyo.value(model.obj, exception=False)
+    block_result['Solve_Time'] = time.perf_counter() - start_time
+    
+    if aggregate:
+        block_result['assignments'] = disaggregate_assignments(model, classes)
+    else:
+        for i in model.I:
+            for j in model.J:
+                if (model.x[i, j].value or 0) > 0.5:
+                    block_result['assignments'][i] = j
+                    break
+    
+    return block_result
+
+def detect_schedule_blocks(costs_df, employees_df, shifts_df, params, chunk_rows=1024):
+    """Split employees and shifts into blocks that can be scheduled independently.
+    
+    If the 'block_column' param names a column of both the 'employees' and 'shifts'
+    sheets, rows sharing a value form a block. Otherwise the blocks are the connected
+    components of the employee-shift graph whose edges are the cells of 'costs' that
+    are finite and below the optional 'block_cost_threshold' param. An employee or shift
+    left without a counterpart joins the block of its cheapest finite-cost partner.
+    The graph is read `chunk_rows` employees at a time and merged with scipy's
+    connected_components, so only one chunk of the matrix is copied at once.
+    Returns a list of (employee_ids, shift_ids) tuples, largest block first.
+    """
+    num_employees, num_shifts = len(employees_df), len(shifts_df)
+    row_idx, col_idx = block_positions(costs_df, employees_df.index, shifts_df.index)
+    costs = costs_df.to_numpy()  # A view for the streamed and stored float32 matrices
+    
+    def read_costs(positions):
+        values = np.asarray(costs[positions])
+        return values if np.issubdtype(values.dtype, np.floating) else values.astype(float)
+    
+    # Nodes are the employees (0..n-1), the shifts (n..n+m-1) and, with a block column,
+    # one node per block key; labels[node] is the connected component of the node
+    block_column = params.get('block_column')
+    use_block_column = block_column in employees_df.columns and block_column in shifts_df.columns
+    if use_block_column:
+        codes, keys = pd.factorize(pd.concat([employees_df[block_column], shifts_df[block_column]]).astype(str))
+    labels = np.arange(num_employees + num_shifts + (len(keys) if use_block_column else 0))
+    
+    def merge(sources, targets):
+        nonlocal labels
+        num_labels = labels.max() + 1 if len(labels) else 0
+        graph = sparse.coo_matrix(
+            (np.ones(len(sources), dtype=np.int8), (labels[sources], labels[targets])), shape=(num_labels, num_labels)
+        )
+        labels = connected_components(graph, directed=False)[1][labels]
+    
+    if use_block_column:
+        merge(np.arange(num_employees + num_shifts), num_employees + num_shifts + codes)
+    else:
+        threshold = params.get('block_cost_threshold', np.inf)
+        if pd.isna(threshold):
+            threshold = np.inf
+        for start in range(0, num_employees, chunk_rows):
+            chunk = read_costs(np.ix_(row_idx[start:start + chunk_rows], col_idx))
+            rows, cols = np.nonzero(np.isfinite(chunk) & (chunk < threshold))
+            merge(start + rows, num_employees + cols)
+    
+    def stranded_nodes():
+        """Employees and shifts whose component has no shift, respectively no employee."""
+        node_labels = labels[:num_employees + num_shifts]
+        has_employee = np.zeros(len(labels), dtype=bool)
+        has_employee[node_labels[:num_employees]] = True
+        has_shift = np.zeros(len(labels), dtype=bool)
+        has_shift[node_labels[num_employees:]] = True
+        return np.nonzero(~(has_employee & has_shift)[node_labels])[0]
+    
+    # Employees without a shift in their block (or shifts without employees) join the
+    # block of their cheapest finite-cost partner, which is where the monolithic model
+    # would assign them
+    sources, targets = [], []
+    for node in stranded_nodes():
+        if node < num_employees:
+            partner_costs, offset = read_costs((row_idx[node], col_idx)), num_employees
+        else:
+            partner_costs, offset = read_costs((row_idx, col_idx[node - num_employees])), 0
+        partner_costs = np.where(np.isfinite(partner_costs), partner_costs, np.inf)
+        if np.isfinite(partner_costs).any():
+            sources.append(node)
+            targets.append(offset + int(partner_costs.argmin()))
+    if sources:
+        merge(np.array(sources), np.array(targets))
+    
+    still_stranded = set(stranded_nodes().tolist())
+    blocks = []
+    members = {}
+    for node, label in enumerate(labels[:num_employees + num_shifts].tolist()):
+        is_employee = node < num_employees
+        node_id = employees_df.index[node] if is_employee else shifts_df.index[node - num_employees]
+        if node in still_stranded:
+            # No finite-cost partner at all: solved alone, so the employee is reported
+            # as unassignable (and the shift as unstaffable if it needs staff)
+            blocks.append(([node_id], []) if is_employee else ([], [node_id]))
+        else:
+            members.setdefault(label, ([], []))[0 if is_employee else 1].append(node_id)
+    blocks.extend(members.values())
+    
+    return sorted(blocks, key=lambda block: len(block[0]) * len(block[1]), reverse=True)
+
+def decomposition_is_exact(employees_df, shifts_df, params):
+    """Whether the detected blocks drop no finite cost, so the sum of block optima is the optimum.
+    
+    Only components of all finite costs qualify; a 'block_column' or 'block_cost_threshold'
+    ignores the finite costs between blocks.
+    """
+    block_column = params.get('block_column')
+    if block_column in employees_df.columns and block_column in shifts_df.columns:
+        return False
+    threshold = params.get('block_cost_threshold', np.inf)
+    return pd.isna(threshold) or threshold == np.inf
+
+def block_positions(costs_df, employee_ids, shift_ids):
+    """Row and column positions of a block in the cost matrix."""
+    row_idx = costs_df.index.get_indexer(employee_ids)
+    col_idx = costs_df.columns.get_indexer(shift_ids)
+    if (row_idx < 0).any() or (col_idx < 0).any():
+        raise KeyError("Some employees or shifts of the block are missing from the 'costs' sheet")
+    return row_idx, col_idx
+
+def block_costs(costs_df, costs, employee_ids, shift_ids):
+    """Cost matrix of one block: the frame itself when the block spans all of it, else a copy read by position from `costs` (its values)."""
+    row_idx, col_idx = block_positions(costs_df, employee_ids, shift_ids)
+    if len(row_idx) == costs_df.shape[0] and len(col_idx) == costs_df.shape[1]:
+        return costs_df  # No copy of the (possibly memory-mapped) matrix
+    return pd.DataFrame(costs[np.ix_(row_idx, col_idx)], index=employee_ids, columns=shift_ids)
+
+def solve_stored_shift_scheduling_block(block_id, costs_key, row_idx, col_idx, employees_df, shifts_df, params, prefs_df=None):
+    """Worker side of a decomposed solve: map the shared cost matrix and read only this block from it."""
+    arrays, _ = default_instance_store().attach(costs_key)
+    costs_df = pd.DataFrame(
+        np.asarray(arrays['costs'][np.ix_(row_idx, col_idx)]), index=employees_df.index, columns=shifts_df.index
+    )
+    return solve_shift_scheduling_block(block_id, costs_df, employees_df, shifts_df, params, prefs_df)
+
+def solve_shift_scheduling_blocks(blocks, costs_df, employees_df, shifts_df, params, prefs_df=None, costs_key=None):
+    """Solve every block, in parallel worker processes when there is more than one.
+    
+    With the cost matrix in the instance store (`costs_key`), workers receive the block's
+    positions and map the matrix themselves; otherwise they receive a copy of the block.
+    """
+    costs = costs_df.to_numpy()  # A view, not a copy, for the streamed and stored float32 matrices
+    
+    def block_jobs():
+        # Generated lazily: only the blocks in flight in the pool are sliced at a time
+        for block_id, (employee_ids, shift_ids) in enumerate(blocks, start=1):
+            block_data = (
+                employees_df.loc[employee_ids],
+                shifts_df.loc[shift_ids],
+                params,
+                prefs_df.reindex(index=employee_ids, columns=shift_ids) if prefs_df is not None else None,
+            )
+            if costs_key is not None and len(blocks) > 1:
+                yield (block_id, costs_key, *block_positions(costs_df, employee_ids, shift_ids), *block_data)
+            else:
+                yield (block_id, block_costs(costs_df, costs, employee_ids, shift_ids), *block_data)
+    
+    if len(blocks) == 1:
+        return [solve_shift_scheduling_block(*next(block_jobs()), tee=True)]
+    
+    solve_block = solve_stored_shift_scheduling_block if costs_key is not None else solve_shift_scheduling_block
+    return map_in_process_pool(solve_block, block_jobs(), clamp_workers(params.get('max_workers')))
+
+def optimize_shift_scheduling(excel_file):
+    """Solve the uploaded instance; return the results text and what the figure and report need."""
+    costs_df, employees_df, shifts_df, params, prefs_df, costs_info = read_shift_scheduling_data(excel_file)
+    
+    # Optional: decompose nearly block-diagonal instances into independent blocks
+    if read_param_flag(params, 'decompose'):
+        blocks = detect_schedule_blocks(costs_df, employees_df, shifts_df, params)
+    else:
+        blocks = [(employees_df.index.tolist(), shifts_df.index.tolist())]
+    
+    start_time = time.perf_counter()
+    block_results = solve_shift_scheduling_blocks(
+        blocks, costs_df, employees_df, shifts_df, params, prefs_df, costs_key=costs_info['store_key']
+    )
+    wall_time = time.perf_counter() - start_time
+    
+    # Merge the block solutions
+    assigned_shift_of = {}
+    for block_result in block_results:
+        assigned_shift_of.update(block_result['assignments'])
+    objectives = [block_result['Objective'] for block_result in block_results]
     
     # Generate analysis
     output_text = ""
-    output_text += f"Status: {result.solver.status}\n"
-    output_text += f"Termination condition: {result.solver.termination_condition}\n"
-    output_text += f"Optimal total cost: {pyo.value(model.obj):.2f}\n\n"
+    output_text += f"Status: {', '.join(sorted({b['Status'] for b in block_results}))}\n"
+    output_text += f"Termination condition: {', '.join(sorted({b['Termination'] for b in block_results}))}\n"
+    if len(block_results) == 1 or decomposition_is_exact(employees_df, shifts_df, params):
+        cost_label = "Optimal total cost"
+    else:
+        # Finite costs between blocks were ignored, so this is a heuristic solution
+        cost_label = "Total cost (sum of block optima, not a global optimum)"
+    if None in objectives:
+        output_text += f"{cost_label}: not available (no solution found)\n\n"
+    else:
+        output_text += f"{cost_label}: {sum(objectives):.2f}\n\n"
+    
+    if len(block_results) > 1:
+        output_text += f"Decomposition: {len(block_results)} blocks solved in {wall_time:.2f}s "
+        output_text += f"(sum of block solve times: {sum(b['Solve_Time'] for b in block_results):.2f}s)\n"
+        for block_result in block_results:
+            output_text += (
+                f"  Block {block_result['Block']}: {block_result['Employees']} employees, "
+                f"{block_result['Shifts']} shifts, {block_result['Termination']}, "
+                f"solved in {block_result['Solve_Time']:.2f}s\n"
+            )
+        output_text += "\n"
+    
+    if read_param_flag(params, 'aggregate_employees'):
+        num_classes = sum(b['Classes'] for b in block_results)
+        output_text += (
+            f"Symmetry aggregation: {len(employees_df)} employees in {num_classes} classes "
+            f"(duplication factor {len(employees_df) / max(num_classes, 1):.1f})\n\n"
+        )
+    
+    if costs_info['read_memory_mb'] is not None:
+        output_text += f"Cost matrix streamed ({costs_info['read_memory_mb']:.0f} MB of read buffers)\n\n"
     
     # Create a dataframe with assignments
     assignments = []
-    for i in model.I:
-        assigned_shift = None
-        for j in model.J:
-            if pyo.value(model.x[i, j]) > 0.5:
-                assigned_shift = j
-                break
+    for i in employees_df.index:
+        assigned_shift = assigned_shift_of.get(i)
         
         if assigned_shift is not None:
             employee_data = {
@@ -150,7 +525,7 @@ def solve_shift_scheduling_model(excel_file):
                 'Assigned_Shift': assigned_shift,
                 'Shift_Start': shifts_df.loc[assigned_shift, 'start_time'],
                 'Shift_End': shifts_df.loc[assigned_shift, 'end_time'],
-                'Assignment_Cost': model.c[i, assigned_shift]
+                'Assignment_Cost': costs_df.loc[i, assigned_shift]
             }
             assignments.append(employee_data)
     
@@ -159,30 +534,56 @@ def solve_shift_scheduling_model(excel_file):
     # Summary by shift
     output_text += "Staff Assignments by Shift:\n"
     shift_summary = {}
-    for j in model.J:
-        assigned_employees = [i for i in model.I if pyo.value(model.x[i, j]) > 0.5]
+    for j in shifts_df.index:
+        assigned_employees = [i for i in employees_df.index if assigned_shift_of.get(i) == j]
+        min_required = shifts_df.loc[j, 'min_staff']
         shift_summary[j] = {
             'Assigned_Staff': len(assigned_employees),
-            'Min_Required': model.r[j],
+            'Min_Required': min_required,
             'Employees': ', '.join([str(employees_df.loc[i, 'name']) if 'name' in employees_df.columns else str(i) for i in assigned_employees])
         }
-        output_text += f"  Shift {j}: {len(assigned_employees)} staff assigned (minimum: {model.r[j]})\n"
+        output_text += f"  Shift {j}: {len(assigned_employees)} staff assigned (minimum: {min_required})\n"
         output_text += f"    Employees: {shift_summary[j]['Employees']}\n"
     
     shift_summary_df = pd.DataFrame(shift_summary).T
     shift_summary_df.index.name = 'Shift'
     shift_summary_df = shift_summary_df.reset_index()
     
-    # Create visualization of the schedule
-    fig = create_schedule_visualization(assignments_df, shifts_df)
-    
-    # Save results to Excel
-    temp_file_path = "shift_scheduling_results.xlsx"
+    report = {
+        'assignments_df': assignments_df,
+        'shift_summary_df': shift_summary_df,
+        'shifts_df': shifts_df,
+        'block_results': block_results,
+    }
+    return output_text, report
+
+def write_shift_scheduling_results(report):
+    """Write the Excel report with the assignments and shift summary and return its path."""
+    # Save to a uniquely named file in the shared results directory
+    temp_file_path = results_path("shift_scheduling_results")
     with pd.ExcelWriter(temp_file_path) as writer:
-        assignments_df.to_excel(writer, sheet_name='Assignments', index=False)
-        shift_summary_df.to_excel(writer, sheet_name='Shift_Summary', index=False)
+        report['assignments_df'].to_excel(writer, sheet_name='Assignments', index=False)
+        report['shift_summary_df'].to_excel(writer, sheet_name='Shift_Summary', index=False)
+        if len(report['block_results']) > 1:
+            blocks_df = pd.DataFrame([{k: v for k, v in b.items() if k != 'assignments'} for b in report['block_results']])
+            blocks_df.to_excel(writer, sheet_name='Blocks', index=False)
     
-    return output_text, fig, temp_file_path
+    return temp_file_path
+
+def solve_shift_scheduling_model(excel_file):
+    """Gradio handler: yield the results text as soon as the solve returns, then the schedule, then the Excel report."""
+    output_text, report = optimize_shift_scheduling(excel_file)
+    yield output_text, None, None
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Write the Excel report while the figure is being built
+        results_file = executor.submit(write_shift_scheduling_results, report)
+        try:
+            fig = create_schedule_visualization(report['assignments_df'], report['shifts_df'])
+            yield output_text, fig, None
+            yield output_text, fig, results_file.result()
+        finally:
+            remove_results_file(results_file)
 
 def create_schedule_visualization(assignments_df, shifts_df):
     """Create a Plotly visualization showing the shift schedule."""
@@ -286,7 +687,7 @@ with gr.Blocks(title="Data-Driven Shift Scheduling") as demo:
         - 'costs' sheet: Cost matrix for assigning employees to shifts (employees as rows, shifts as columns)
         - 'employees' sheet: Information about employees (ID as index, with employee attributes)
         - 'shifts' sheet: Information about shifts (ID as index, with min_staff, start_time, and end_time)
-        - 'params' sheet (optional): General parameters for the model
+        - 'params' sheet (optional): General parameters for the model (set 'stream_matrices' to 1 to read the 'costs' sheet row by row as float32, as large uploads and servers with a shared instance store always do; set 'aggregate_employees' to 1 to merge employees with identical costs and preferences into classes; set 'decompose' to 1 to solve independent blocks of employees and shifts in parallel, grouped by 'block_column' or detected from finite costs below 'block_cost_threshold')
         - 'preferences' sheet (optional): Employee shift preferences (1=preferred, 0=not preferred)
         """)
     
@@ -304,9 +705,10 @@ with gr.Blocks(title="Data-Driven Shift Scheduling") as demo:
     submit_btn.click(
         solve_shift_scheduling_model,
         inputs=[input_file],
-        outputs=[output_text, output_plot, output_file]
+        outputs=[output_text, output_plot, output_file],
+        api_name="solve"
     )
 
 # Launch the app
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    launch(demo)
\ No newline at end of file
@@ -7,8 +7,15 @@ import pandas as pd
 import pyomo.environ as pyo
 import plotly.graph_objects as go
 import gradio as gr
+import heapq
 import io
 import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from demo_common import clamp_workers, launch, map_in_process_pool, read_param_flag, remove_results_file, results_path
+from instance_store import default_instance_store
+from streaming_reader import is_large_upload, read_sparse_coverage
 
 """
 Set Covering Problem Mathematical Formulation:
@@ -29,44 +36,130 @@ The objective is to minimize the total cost while ensuring all demand points are
 Optional budget constraint: ∑(c_i * x_i) ≤ B, where B is the available budget.
 """
 
-def solve_set_covering_model(excel_file):
+def read_set_covering_data(excel_file):
     # Read data from the uploaded Excel file
-    # 'coverage' sheet contains a binary matrix where rows are sets and columns are elements
-    coverage_df = pd.read_excel(excel_file, sheet_name='coverage', index_col=0)
-    
-    # 'sources' sheet contains the costs and coordinates of each set (W)
-    sources_df = pd.read_excel(excel_file, sheet_name='sources', index_col=0)
-    
     # 'params' sheet contains general parameters
     params = pd.read_excel(excel_file, sheet_name='params').to_dict(orient='list')
     params = {name_: value_ for name_, value_ in zip(params["name"], params["val"])}
     
+    # 'coverage' sheet contains a binary matrix where rows are sets and columns are elements;
+    # coverage_info records the peak size of the reader's buffers ('read_memory_mb', None when
+    # not streamed) and the instance store key of the matrix ('store_key', None without a store)
+    coverage_info = {'read_memory_mb': None, 'store_key': None}
+    store = default_instance_store()
+    if store is not None:
+        # Multi-worker deployments parse each workbook once and share the sparse matrix; the
+        # coverage view slices the mapped arrays directly and holds them until the report is dropped
+        def load_coverage():
+            matrix, set_ids, element_ids, coverage_info['read_memory_mb'] = read_sparse_coverage(excel_file, 'coverage')
+            return {'indptr': matrix.indptr, 'indices': matrix.indices}, {'set_ids': set_ids, 'element_ids': element_ids}
+        coverage_info['store_key'] = store.key_for(excel_file, 'coverage')
+        arrays, labels = store.attach(coverage_info['store_key'], load_coverage)
+        set_elements = sparse_coverage_sets(arrays['indptr'], arrays['indices'], labels['set_ids'], labels['element_ids'])
+    elif read_param_flag(params, 'stream_matrices') or is_large_upload(excel_file):
+        # Stream large uploads row by row into a sparse boolean matrix
+        matrix, set_ids, element_ids, coverage_info['read_memory_mb'] = read_sparse_coverage(excel_file, 'coverage')
+        set_elements = sparse_coverage_sets(matrix.indptr, matrix.indices, set_ids, element_ids)
+    else:
+        coverage_df = pd.read_excel(excel_file, sheet_name='coverage', index_col=0)
+        set_elements = coverage_sets(coverage_df)
+    
+    # 'sources' sheet contains the costs and coordinates of each set (W)
+    sources_df = pd.read_excel(excel_file, sheet_name='sources', index_col=0)
+    
     # 'dests' sheet contains coordinates for elements (E)
     dests_df = pd.read_excel(excel_file, sheet_name='dests', index_col=0)
     
+    return set_elements, sources_df, dests_df, params, coverage_info
+
+class CoverageMatrix(Mapping):
+    """Read-only {row label: [column labels]} view of the indptr/indices arrays of a CSR matrix.
+    
+    Rows are sliced out of the arrays on access, so memory-mapped arrays from the
+    instance store stay the only copy of the matrix, and the attachment is held for
+    as long as the view (or any view sharing its arrays) is alive. `rows` maps each
+    label to its row in the arrays, or to None for a row without entries.
+    """
+    
+    def __init__(self, indptr, indices, column_ids, rows):
+        self.indptr = indptr
+        self.indices = indices
+        self.column_ids = np.asarray(column_ids, dtype=object)
+        self.rows = rows
+    
+    def __getitem__(self, label):
+        row = self.rows[label]
+        if row is None:
+            return []
+        return self.column_ids[self.indices[self.indptr[row]:self.indptr[row + 1]]].tolist()
+    
+    def __iter__(self):
+        return iter(self.rows)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def reindex(self, labels):
+        """The same matrix over `labels`, in that order; labels it has no row for get no entries."""
+        return CoverageMatrix(self.indptr, self.indices, self.column_ids, {i: self.rows.get(i) for i in labels})
+    
+    def transpose(self, labels):
+        """{column label: [row labels]} over `labels`, built as new CSR arrays from the rows in this view."""
+        row_ids = [i for i, row in self.rows.items() if row is not None]
+        starts = np.array([self.indptr[self.rows[i]] for i in row_ids], dtype=np.int64)
+        ends = np.array([self.indptr[self.rows[i] + 1] for i in row_ids], dtype=np.int64)
+        columns = np.concatenate(
+            [self.indices[start:end] for start, end in zip(starts, ends)] + [np.empty(0, dtype=np.int64)]
+        ).astype(np.int64)
+        owners = np.repeat(np.arange(len(row_ids)), ends - starts)
+        
+        # Counting sort by column; the stable sort keeps the row order within each column
+        indptr = np.zeros(len(self.column_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(columns, minlength=len(self.column_ids)), out=indptr[1:])
+        indices = owners[np.argsort(columns, kind='stable')]
+        
+        column_of = {j: col for col, j in enumerate(self.column_ids)}
+        return CoverageMatrix(indptr, indices, row_ids, {j: column_of.get(j) for j in labels})
+
+def coverage_sets(coverage_df):
+    """Return {set: [elements it covers]} from the binary 'coverage' matrix."""
+    covered = coverage_df.to_numpy() > 0.5
+    indptr = np.concatenate([[0], np.cumsum(covered.sum(axis=1))])
+    return sparse_coverage_sets(indptr, np.nonzero(covered)[1], coverage_df.index, coverage_df.columns)
+
+def sparse_coverage_sets(indptr, indices, set_ids, element_ids):
+    """Return {set: [elements it covers]} from the indptr/indices arrays of a CSR coverage matrix."""
+    return CoverageMatrix(indptr, indices, element_ids, {i: row for row, i in enumerate(set_ids)})
+
+def covering_sets(set_elements, elements):
+    """Return {element: [sets covering it]} for the given elements."""
+    return set_elements.transpose(elements)
+
+def build_set_covering_model(costs, element_sets, budget=float('inf')):
+    """Build the SCP model over the sets in `costs` and the elements in `element_sets`.
+    
+    Only the nonzero a_ij are used: element j is covered by the sets in element_sets[j].
+    """
+    uncovered = [j for j, sets in element_sets.items() if not sets]
+    if uncovered:
+        raise Exception(f"Elements not covered by any set: {', '.join(str(j) for j in uncovered)}")
+    
     # Initialize the model
     model = pyo.ConcreteModel()
     
     # Define the sets
-    model.I = pyo.Set(initialize=sources_df.index.tolist())  # Sets to choose from
-    model.J = pyo.Set(initialize=dests_df.index.tolist())  # Elements to cover
+    model.I = pyo.Set(initialize=list(costs))  # Sets to choose from
+    model.J = pyo.Set(initialize=list(element_sets))  # Elements to cover
     
     # Define the decision variables (binary: 1 if set i is chosen, 0 otherwise)
     model.x = pyo.Var(model.I, domain=pyo.Binary)
     
     # Define the parameters
-    # a_ij: 1 if element j is covered by set i, 0 otherwise
-    def a_init(model, i, j):
-        return coverage_df.loc[i, j]
-    model.a = pyo.Param(model.I, model.J, initialize=a_init)
-    
     # c_i: cost of selecting set i
-    def c_init(model, i):
-        return sources_df.loc[i, 'cost']
-    model.c = pyo.Param(model.I, initialize=c_init)
+    model.c = pyo.Param(model.I, initialize=costs)
     
     # Budget constraint (optional)
-    model.budget = pyo.Param(initialize=params.get('budget', float('inf')))
+    model.budget = pyo.Param(initialize=budget)
     
     # Define the objective function (minimize the total cost)
     def obj_rule(model):
@@ -76,7 +169,7 @@ def solve_set_covering_model(excel_file):
     # Define the constraints
     # Each element must be covered by at least one selected set
     def coverage_constraint(model, j):
-        return sum(model.a[i, j] * model.x[i] for i in model.I) >= 1
+        return sum(model.x[i] for i in element_sets[j]) >= 1
     model.coverage_constraint = pyo.Constraint(model.J, rule=coverage_constraint)
     
     # Budget constraint (optional)
@@ -84,72 +177,451 @@ def solve_set_covering_model(excel_file):
         return sum(model.c[i] * model.x[i] for i in model.I) <= model.budget
     
     # Only add budget constraint if a budget is specified and it's not infinite
-    if params.get('budget', float('inf')) != float('inf'):
+    if budget != float('inf'):
         model.budget_constraint = pyo.Constraint(rule=budget_constraint)
     
+    return model
+
+def solve_with_glpk(model, tee=False):
     # Solve the model using GLPK
-    result = None
-    solver_error = None
-    
     try:
-        # Use GLPK as the primary solver
         solver = pyo.SolverFactory('glpk')
         if solver.available():
-            result = solver.solve(model, tee=True)
-            output_text = "Using solver: GLPK\n\n"
+            return solver.solve(model, tee=tee)
         else:
             raise Exception("GLPK solver is not available")
     except Exception as e:
-        solver_error = str(e)
-        raise Exception(f"Failed to solve with GLPK: {solver_error}")
+        raise Exception(f"Failed to solve with GLPK: {str(e)}")
+
+def partition_into_tiles(dests_df, params):
+    """Partition the elements into a grid of spatial tiles using their x/y coordinates.
+    
+    The 'tiles' param sets the number of tiles per axis. Each tile is returned as
+    (core elements, elements within 'tile_margin' of the tile), so that sets spanning
+    a tile border are chosen with the demand on both sides in view. Every element
+    belongs to exactly one core.
+    """
+    num_tiles = int(params.get('tiles', 2))
+    margin = float(params.get('tile_margin', 0))
+    x = dests_df['x'].to_numpy(dtype=float)
+    y = dests_df['y'].to_numpy(dtype=float)
+    
+    x_edges = np.linspace(x.min(), x.max(), num_tiles + 1)
+    y_edges = np.linspace(y.min(), y.max(), num_tiles + 1)
+    tile_col = np.clip(np.searchsorted(x_edges, x, side='right') - 1, 0, num_tiles - 1)
+    tile_row = np.clip(np.searchsorted(y_edges, y, side='right') - 1, 0, num_tiles - 1)
+    
+    tiles = []
+    for col in range(num_tiles):
+        for row in range(num_tiles):
+            core = (tile_col == col) & (tile_row == row)
+            if not core.any():
+                continue
+            with_margin = (
+                (x >= x_edges[col] - margin) & (x <= x_edges[col + 1] + margin)
+                & (y >= y_edges[row] - margin) & (y <= y_edges[row + 1] + margin)
+            )
+            tiles.append((dests_df.index[core].tolist(), dests_df.index[core | with_margin].tolist()))
+    return tiles
+
+def solve_set_covering_tile(tile_id, costs, element_sets):
+    """Solve the SCP restricted to the elements of one tile.
+    
+    `costs` holds every set covering at least one of the tile's elements, so the
+    tile optimum is a valid lower bound for the full problem. Returns a plain
+    dict (picklable) so tiles can be solved in worker processes.
+    """
+    start_time = time.perf_counter()
+    model = build_set_covering_model(costs, element_sets)
+    result = solve_with_glpk(model)
+    
+    termination = str(result.solver.termination_condition)
+    objective = pyo.value(model.obj, exception=False)
+    if termination == 'optimal':
+        lower_bound = objective
+    else:
+        lower_bound = result.problem.lower_bound
+        if lower_bound is None or not np.isfinite(lower_bound):
+            lower_bound = None
+    
+    return {
+        'Tile': tile_id,
+        'Elements': len(element_sets),
+        'Candidate_Sets': len(costs),
+        'Status': str(result.solver.status),
+        'Termination': termination,
+        'Objective': objective,
+        'Lower_Bound': lower_bound,
+        'Solve_Time': time.perf_counter() - start_time,
+        'selected': [i for i in model.I if (model.x[i].value or 0) > 0.5],
+    }
+
+def repair_cover(selected_sets, costs, set_elements, element_sets):
+    """Turn the union of tile covers into a feasible, irredundant cover.
+    
+    Gaps are filled greedily (cheapest cost per newly covered element), then
+    selected sets are dropped, most expensive first, while everything stays covered.
+    """
+    selected = set(selected_sets)
+    cover_count = {j: 0 for j in element_sets}
+    for i in selected:
+        for j in set_elements.get(i, []):
+            if j in cover_count:
+                cover_count[j] += 1
+    
+    # Fill gaps
+    uncovered = {j for j, count in cover_count.items() if count == 0}
+    while uncovered:
+        candidates = {i for j in uncovered for i in element_sets[j]} - selected
+        if not candidates:
+            break
+        best = min(candidates, key=lambda i: costs[i] / len(uncovered.intersection(set_elements[i])))
+        selected.add(best)
+        for j in set_elements[best]:
+            if j in cover_count:
+                cover_count[j] += 1
+        uncovered -= set(set_elements[best])
+    
+    # Remove redundant sets
+    for i in sorted(selected, key=lambda i: costs[i], reverse=True):
+        covered = [j for j in set_elements.get(i, []) if j in cover_count]
+        if all(cover_count[j] > 1 for j in covered):
+            selected.remove(i)
+            for j in covered:
+                cover_count[j] -= 1
+    
+    return [i for i in costs if i in selected]
+
+def dual_ascent_lower_bound(costs, set_elements, element_sets):
+    """Lower bound on the optimal cost from a feasible solution of the LP dual.
+    
+    Each element j gets a price u_j no larger than the remaining slack of every
+    set covering it; sum(u_j) is then a valid lower bound on any cover's cost.
+    """
+    slack = dict(costs)
+    bound = 0.0
+    # Elements with few covering sets first: their price constrains fewer sets
+    for j in sorted(element_sets, key=lambda j: len(element_sets[j])):
+        if not element_sets[j]:
+            continue
+        price = min(slack[i] for i in element_sets[j])
+        if price <= 0:
+            continue
+        bound += price
+        for i in element_sets[j]:
+            slack[i] -= price
+    return bound
+
+def solve_stored_set_covering_tile(tile_id, costs, elements, coverage_key):
+    """Worker side of a decomposed solve: map the shared coverage matrix and take this tile's sets from it."""
+    arrays, labels = default_instance_store().attach(coverage_key)
+    set_elements = sparse_coverage_sets(arrays['indptr'], arrays['indices'], labels['set_ids'], labels['element_ids'])
+    return solve_set_covering_tile(tile_id, costs, covering_sets(set_elements.reindex(costs), elements))
+
+def solve_set_covering_decomposed(costs, set_elements, dests_df, params, coverage_key=None):
+    """Solve the SCP tile by tile in parallel, then stitch and repair the covers.
+    
+    With the coverage matrix in the instance store (`coverage_key`), workers receive the
+    tile's elements and candidate sets and map the matrix themselves; otherwise they
+    receive the tile's {element: [sets]} lists.
+    """
+    element_sets = covering_sets(set_elements, dests_df.index)
+    tiles = partition_into_tiles(dests_df, params)
+    
+    def tile_jobs():
+        # Generated lazily: only the tiles in flight in the pool are built at a time
+        for tile_id, (core, elements) in enumerate(tiles, start=1):
+            tile_costs = {i: costs[i] for j in elements for i in element_sets[j]}
+            if coverage_key is not None:
+                yield (tile_id, tile_costs, elements, coverage_key)
+            else:
+                yield (tile_id, tile_costs, {j: element_sets[j] for j in elements})
+    
+    solve_tile = solve_stored_set_covering_tile if coverage_key is not None else solve_set_covering_tile
+    tile_results = map_in_process_pool(solve_tile, tile_jobs(), clamp_workers(params.get('max_workers')))
+    
+    stitched = [i for tile_result in tile_results for i in tile_result['selected']]
+    selected_sets = repair_cover(stitched, costs, set_elements, element_sets)
+    
+    # Every tile optimum and the dual bound are lower bounds; keep the best one
+    tile_bounds = [t['Lower_Bound'] for t in tile_results if t['Lower_Bound'] is not None]
+    lower_bound = max(tile_bounds + [dual_ascent_lower_bound(costs, set_elements, element_sets)])
+    
+    return selected_sets, lower_bound, tile_results
+
+def element_weights(dests_df, params):
+    """Demand weight of each element: the 'demand_column' of 'dests' if present, else 1."""
+    demand_column = params.get('demand_column', 'demand')
+    if demand_column in dests_df.columns:
+        return dests_df[demand_column].fillna(0).astype(float).to_dict()
+    return {j: 1.0 for j in dests_df.index}
+
+def lazy_greedy_max_coverage(costs, set_elements, weights, budget=float('inf')):
+    """Budgeted maximum coverage by lazy greedy on the gain/cost ratio.
+    
+    Marginal gains only shrink as elements get covered, so a stale ratio popped
+    from the priority queue is an upper bound: it is recomputed and pushed back
+    unless it is still the best. The result is compared with the best single
+    affordable set, which gives the usual (1 - 1/e) / 2 guarantee.
+    Returns (selected sets, covered weight, [(cumulative cost, cumulative weight)]).
+    """
+    def ratio(gain, cost):
+        return gain / cost if cost > 0 else float('inf')
+    
+    # Heap entries: (-ratio, tie-breaker, set); the tie-breaker avoids comparing set labels
+    heap = []
+    for order, (i, elements) in enumerate(set_elements.items()):
+        gain = sum(weights.get(j, 0) for j in elements)
+        if gain > 0:
+            heap.append((-ratio(gain, costs[i]), order, i))
+    heapq.heapify(heap)
+    
+    covered = set()
+    selected = []
+    spent = covered_weight = 0.0
+    trace = []
+    while heap:
+        neg_ratio, order, i = heapq.heappop(heap)
+        gain = sum(weights.get(j, 0) for j in set_elements[i] if j not in covered)
+        if gain <= 0:
+            continue
+        current_ratio = ratio(gain, costs[i])
+        if heap and current_ratio < -heap[0][0]:
+            # Stale entry: no longer the best, requeue with its up-to-date ratio
+            heapq.heappush(heap, (-current_ratio, order, i))
+            continue
+        if spent + costs[i] > budget:
+            continue  # Not affordable any more, try cheaper sets
+        selected.append(i)
+        covered.update(set_elements[i])
+        spent += costs[i]
+        covered_weight += gain
+        trace.append((spent, covered_weight))
+    
+    # Best single affordable set
+    single_sets = [
+        (sum(weights.get(j, 0) for j in set_elements[i]), i)
+        for i in set_elements if costs[i] <= budget
+    ]
+    if single_sets:
+        best_weight, best_set = max(single_sets, key=lambda item: item[0])
+        if best_weight > covered_weight:
+            return [best_set], best_weight, [(costs[best_set], best_weight)]
+    
+    return selected, covered_weight, trace
+
+def build_max_coverage_model(costs, element_sets, weights, budget):
+    """Budgeted maximum coverage MIP: maximize covered demand within the budget."""
+    # Initialize the model
+    model = pyo.ConcreteModel()
+    
+    # Define the sets
+    model.I = pyo.Set(initialize=list(costs))  # Sets to choose from
+    model.J = pyo.Set(initialize=list(element_sets))  # Elements to cover
+    
+    # Define the decision variables
+    # x_i: 1 if set i is chosen; z_j: 1 if element j is covered
+    model.x = pyo.Var(model.I, domain=pyo.Binary)
+    model.z = pyo.Var(model.J, domain=pyo.UnitInterval)
+    
+    # Define the parameters
+    model.c = pyo.Param(model.I, initialize=costs)
+    model.w = pyo.Param(model.J, initialize={j: weights.get(j, 0) for j in element_sets})
+    model.budget = pyo.Param(initialize=budget)
+    
+    # Define the objective function (maximize the covered demand)
+    def obj_rule(model):
+        return sum(model.w[j] * model.z[j] for j in model.J)
+    model.obj = pyo.Objective(rule=obj_rule, sense=pyo.maximize)
+    
+    # Define the constraints
+    # An element only counts as covered if a selected set covers it
+    def coverage_constraint(model, j):
+        return model.z[j] <= sum(model.x[i] for i in element_sets[j])
+    model.coverage_constraint = pyo.Constraint(model.J, rule=coverage_constraint)
+    
+    # The total cost of the selected sets stays within the budget
+    def budget_constraint(model):
+        return sum(model.c[i] * model.x[i] for i in model.I) <= model.budget
+    model.budget_constraint = pyo.Constraint(rule=budget_constraint)
+    
+    return model
+
+def solve_max_coverage(costs, set_elements, dests_df, params, budget):
+    """Budgeted maximum coverage with the lazy greedy engine or, with 'engine' = 'mip', GLPK.
+    
+    Returns (output text, selected sets, cost-vs-coverage tradeoff dataframe).
+    """
+    weights = element_weights(dests_df, params)
+    total_weight = sum(weights.values())
+    engine = str(params.get('engine', 'greedy')).strip().lower()
     
-    # Generate analysis
     output_text = ""
-    output_text += f"Status: {result.solver.status}\n"
-    output_text += f"Termination condition: {result.solver.termination_condition}\n"
-    output_text += f"Optimal cost: {pyo.value(model.obj)}\n\n"
+    if engine == 'mip':
+        element_sets = covering_sets(set_elements, dests_df.index)
+        model = build_max_coverage_model(costs, element_sets, weights, budget)
+        result = solve_with_glpk(model, tee=True)
+        selected_sets = [i for i in model.I if (model.x[i].value or 0) > 0.5]
+        covered_weight = pyo.value(model.obj)
+        output_text += f"Status: {result.solver.status}\n"
+        output_text += f"Termination condition: {result.solver.termination_condition}\n"
+    else:
+        selected_sets, covered_weight, _ = lazy_greedy_max_coverage(costs, set_elements, weights, budget)
+        output_text += "Status: ok\n"
+        output_text += "Termination condition: lazy greedy\n"
+    
+    total_cost = sum(costs[i] for i in selected_sets)
+    output_text += f"Covered demand: {covered_weight} of {total_weight} ({covered_weight / total_weight if total_weight else 1:.2%})\n"
+    output_text += f"Total cost: {total_cost} (budget: {budget})\n\n"
+    
+    # Tradeoff curve: every prefix of the unbudgeted greedy sequence is the greedy
+    # answer for the budget it spends, so one incremental pass sweeps all budgets
+    _, _, trace = lazy_greedy_max_coverage(costs, set_elements, weights)
+    tradeoff_df = pd.DataFrame(trace, columns=['Budget', 'Covered_Demand'])
+    tradeoff_df['Coverage_Pct'] = tradeoff_df['Covered_Demand'] / total_weight if total_weight else 1.0
+    tradeoff_df.insert(0, 'Sets', range(1, len(tradeoff_df) + 1))
+    output_text += f"Cost-vs-coverage tradeoff: {len(tradeoff_df)} budget levels (see 'Tradeoff' sheet)\n\n"
+    
+    return output_text, selected_sets, tradeoff_df
+
+def optimize_set_covering(excel_file):
+    """Solve the uploaded instance; return the results text and what the figure and report need."""
+    set_elements, sources_df, dests_df, params, coverage_info = read_set_covering_data(excel_file)
+    
+    # c_i: cost of selecting set i, and the elements each set covers (nonzero a_ij)
+    costs = sources_df['cost'].to_dict()
+    set_elements = set_elements.reindex(sources_df.index)
+    budget = params.get('budget', float('inf'))
+    
+    output_text = ""
+    tile_results = []
+    tradeoff_df = None
+    mode = str(params.get('mode', 'cover')).strip().lower()
+    if mode == 'max_coverage':
+        # Optional: maximize the covered demand within the budget instead of covering everything
+        mode_text, selected_sets, tradeoff_df = solve_max_coverage(costs, set_elements, dests_df, params, budget)
+        output_text += mode_text
+    elif read_param_flag(params, 'decompose'):
+        # Optional: spatial decomposition for instances too large for one MIP
+        start_time = time.perf_counter()
+        selected_sets, lower_bound, tile_results = solve_set_covering_decomposed(
+            costs, set_elements, dests_df, params, coverage_key=coverage_info['store_key']
+        )
+        wall_time = time.perf_counter() - start_time
+        total_cost = sum(costs[i] for i in selected_sets)
+        gap = (total_cost - lower_bound) / total_cost if total_cost > 0 else 0.0
+        
+        output_text += f"Status: {', '.join(sorted({t['Status'] for t in tile_results}))}\n"
+        output_text += f"Termination condition: {', '.join(sorted({t['Termination'] for t in tile_results}))}\n"
+        output_text += f"Stitched cost: {total_cost}\n"
+        output_text += f"Global lower bound: {lower_bound:.4f} (gap: {gap:.2%})\n"
+        if budget != float('inf') and total_cost > budget:
+            output_text += f"Warning: stitched cost exceeds the budget of {budget}\n"
+        output_text += f"\nDecomposition: {len(tile_results)} tiles solved in {wall_time:.2f}s\n"
+        for tile_result in tile_results:
+            output_text += (
+                f"  Tile {tile_result['Tile']}: {tile_result['Elements']} elements, "
+                f"{tile_result['Candidate_Sets']} candidate sets, {tile_result['Termination']}, "
+                f"solved in {tile_result['Solve_Time']:.2f}s\n"
+            )
+        output_text += "\n"
+    else:
+        element_sets = covering_sets(set_elements, dests_df.index)
+        model = build_set_covering_model(costs, element_sets, budget)
+        result = solve_with_glpk(model, tee=True)
+        
+        infeasible = result.solver.termination_condition in (
+            pyo.TerminationCondition.infeasible, pyo.TerminationCondition.infeasibleOrUnbounded
+        )
+        if infeasible and budget != float('inf'):
+            # The budget is too tight to cover every element: cover as much as it allows
+            output_text += f"The budget of {budget} cannot cover every element, switching to maximum coverage.\n\n"
+            mode_text, selected_sets, tradeoff_df = solve_max_coverage(costs, set_elements, dests_df, params, budget)
+            output_text += mode_text
+        else:
+            # Generate analysis
+            output_text += f"Status: {result.solver.status}\n"
+            output_text += f"Termination condition: {result.solver.termination_condition}\n"
+            output_text += f"Optimal cost: {pyo.value(model.obj)}\n\n"
+            selected_sets = [i for i in model.I if pyo.value(model.x[i]) > 0.5]
     
     # Selected sets
-    selected_sets = [i for i in model.I if pyo.value(model.x[i]) > 0.5]
-    output_text += f"Selected sets ({len(selected_sets)} of {len(model.I)}):\n"
+    output_text += f"Selected sets ({len(selected_sets)} of {len(sources_df)}):\n"
     for i in selected_sets:
-        output_text += f"  - Set {i} (Cost: {model.c[i]})\n"
+        output_text += f"  - Set {i} (Cost: {costs[i]})\n"
     
     # Check coverage (for validation)
     covered_elements = set()
     for i in selected_sets:
-        for j in model.J:
-            if model.a[i, j] > 0.5:
-                covered_elements.add(j)
-    
-    output_text += f"\nTotal elements covered: {len(covered_elements)} of {len(model.J)}\n"
-    
-    # Create Plotly spatial visualization of coverage
-    plotly_fig = create_coverage_visualization(sources_df, dests_df, model, selected_sets)
+        covered_elements.update(set_elements[i])
+    covered_elements &= set(dests_df.index)
+    
+    output_text += f"\nTotal elements covered: {len(covered_elements)} of {len(dests_df)}\n"
+    if coverage_info['read_memory_mb'] is not None:
+        output_text += f"Coverage matrix streamed ({coverage_info['read_memory_mb']:.0f} MB of read buffers)\n"
+    
+    report = {
+        'sources_df': sources_df,
+        'dests_df': dests_df,
+        'costs': costs,
+        'set_elements': set_elements,
+        'selected_sets': selected_sets,
+        'tile_results': tile_results,
+        'tradeoff_df': tradeoff_df,
+    }
+    return output_text, report
+
+def write_set_covering_results(report):
+    """Write the Excel report with detailed results and return its path."""
+    sources_df, costs, set_elements = report['sources_df'], report['costs'], report['set_elements']
+    selected = set(report['selected_sets'])
     
     # Create Excel report with detailed results
     results_df = pd.DataFrame({
-        "Set": list(model.I),
-        "Cost": [model.c[i] for i in model.I],
-        "Selected": [pyo.value(model.x[i]) > 0.5 for i in model.I],
+        "Set": list(sources_df.index),
+        "Cost": [costs[i] for i in sources_df.index],
+        "Selected": [i in selected for i in sources_df.index],
     })
     
     # Add the number of elements covered by each set
-    results_df["Elements_Covered"] = [sum(model.a[i, j] for j in model.J) for i in model.I]
+    results_df["Elements_Covered"] = [len(set_elements[i]) for i in sources_df.index]
     
     # Add the specific elements covered by each set (as a string list)
     results_df["Covers_Elements"] = [
-        ", ".join([str(j) for j in model.J if model.a[i, j] > 0.5])
-        for i in model.I
+        ", ".join([str(j) for j in set_elements[i]])
+        for i in sources_df.index
     ]
     
-    # Save to file
-    temp_file_path = "set_covering_results.xlsx"
-    results_df.to_excel(temp_file_path, index=False)
-    
-    return output_text, plotly_fig, temp_file_path
+    # Save to a uniquely named file in the shared results directory
+    temp_file_path = results_path("set_covering_results")
+    with pd.ExcelWriter(temp_file_path) as writer:
+        results_df.to_excel(writer, index=False)
+        if report['tile_results']:
+            tiles_df = pd.DataFrame([{k: v for k, v in t.items() if k != 'selected'} for t in report['tile_results']])
+            tiles_df.to_excel(writer, sheet_name='Tiles', index=False)
+        if report['tradeoff_df'] is not None:
+            report['tradeoff_df'].to_excel(writer, sheet_name='Tradeoff', index=False)
+    
+    return temp_file_path
+
+def solve_set_covering_model(excel_file):
+    """Gradio handler: yield the results text as soon as the solve returns, then the map, then the Excel report."""
+    output_text, report = optimize_set_covering(excel_file)
+    yield output_text, None, None
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Write the Excel report while the figure is being built
+        results_file = executor.submit(write_set_covering_results, report)
+        try:
+            plotly_fig = create_coverage_visualization(
+                report['sources_df'], report['dests_df'], report['set_elements'], report['selected_sets']
+            )
+            yield output_text, plotly_fig, None
+            yield output_text, plotly_fig, results_file.result()
+        finally:
+            remove_results_file(results_file)
 
-def create_coverage_visualization(sources_df, dests_df, model, selected_sets):
+def create_coverage_visualization(sources_df, dests_df, set_elements, selected_sets):
     """Create a Plotly visualization showing sets, elements, and coverage."""
     # Create a figure
     fig = go.Figure()
@@ -160,15 +632,14 @@ def create_coverage_visualization(sources_df, dests_df, model, selected_sets):
     # Directly use the index of dests_df as element IDs
     for element_id, row in dests_df.iterrows():
         # Element ID is directly from the dataframe index
-        if element_id in model.J:
-            element_coords[element_id] = (row['x'], row['y'])
+        element_coords[element_id] = (row['x'], row['y'])
     
     # Add all elements as scatter points
     element_x = []
     element_y = []
     element_text = []
     
-    for j in model.J:
+    for j in dests_df.index:
         if j in element_coords:
             element_x.append(element_coords[j][0])
             element_y.append(element_coords[j][1])
@@ -192,10 +663,9 @@ def create_coverage_visualization(sources_df, dests_df, model, selected_sets):
     set_coords = {}
     set_costs = {}
     
-    for i in model.I:
-        if i in sources_df.index:
-            set_coords[i] = (sources_df.loc[i, 'x'], sources_df.loc[i, 'y'])
-            set_costs[i] = sources_df.loc[i, 'cost']
+    for i in sources_df.index:
+        set_coords[i] = (sources_df.loc[i, 'x'], sources_df.loc[i, 'y'])
+        set_costs[i] = sources_df.loc[i, 'cost']
     
     # Prepare data for all sets, but track which ones are selected
     all_set_x = []
@@ -204,7 +674,7 @@ def create_coverage_visualization(sources_df, dests_df, model, selected_sets):
     all_set_text = []
     all_set_is_selected = []  # To control opacity
     
-    for i in model.I:
+    for i in sources_df.index:
         if i in set_coords:
             all_set_x.append(set_coords[i][0])
             all_set_y.append(set_coords[i][1])
@@ -248,8 +718,8 @@ def create_coverage_visualization(sources_df, dests_df, model, selected_sets):
         set_x, set_y = set_coords[i]
         
         # Find all elements covered by this set
-        for j in model.J:
-            if model.a[i, j] > 0.5 and j in element_coords:
+        for j in set_elements.get(i, []):
+            if j in element_coords:
                 element_x_j, element_y_j = element_coords[j]
                 
                 # Draw a line from set to element
@@ -352,7 +822,7 @@ with gr.Blocks(title="Data-Driven Set Covering") as demo:
         - 'coverage' sheet: A binary matrix where rows are sets and columns are elements
         - 'sources' sheet: Contains the costs and coordinates (x, y) of each set W (with Set IDs as index)
         - 'dests' sheet: Contains coordinates for elements E with columns: name, x, and y
-        - 'params' sheet: Contains parameters like 'budget' (optional)
+        - 'params' sheet: Contains parameters like 'budget' (optional), 'stream_matrices' = 1 to read the 'coverage' sheet row by row into a sparse matrix (large uploads are always streamed), 'mode' = 'max_coverage' to maximize the covered demand (optional 'demand' column in 'dests') within the budget using the lazy greedy or 'engine' = 'mip', or 'decompose' = 1 with 'tiles' (per axis) and 'tile_margin' to solve large instances as spatial tiles in parallel
         """)
         
     with gr.Row():
@@ -369,9 +839,10 @@ with gr.Blocks(title="Data-Driven Set Covering") as demo:
     submit_btn.click(
         solve_set_covering_model,
         inputs=[input_file],
-        outputs=[output_text, output_plotly, output_file]
+        outputs=[output_text, output_plotly, output_file],
+        api_name="solve"
     )
 
 # Launch the app
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    launch(demo)
\ No newline at end of file
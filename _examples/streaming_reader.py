@@ -0,0 +1,150 @@
+"""
+Streaming, bounded-memory readers for the large matrix sheets of the demos:
+the binary 'coverage' matrix of the Set Covering Problem and the 'costs' matrix
+of the Shift Scheduling Problem.
+
+Instead of loading a whole sheet into a dense int64/float64 DataFrame, the matrix
+is walked row by row (openpyxl read-only mode) and converted on the fly:
+- coverage -> scipy.sparse CSR boolean matrix (only the nonzero positions are kept)
+- costs    -> float32 numpy array
+
+Server settings (environment variables), applied to every upload:
+- STREAM_THRESHOLD_MB: uploads larger than this are always streamed (default 2)
+- MATRIX_MEMORY_LIMIT_MB: ceiling on the buffers of one read (default 1024, 0 for none).
+  Only what the reader itself allocates is counted, not the process RSS, which is
+  shared with the other requests the server is handling.
+"""
+import os
+import sys
+from array import array
+
+import numpy as np
+from openpyxl import load_workbook
+from scipy import sparse
+
+DEFAULT_STREAM_THRESHOLD_MB = 2
+DEFAULT_MEMORY_LIMIT_MB = 1024
+
+# How often (in rows) the memory ceiling is checked
+MEMORY_CHECK_INTERVAL = 256
+
+class MemoryLimitExceeded(MemoryError):
+    """Raised when the buffers of a matrix read grow past the memory ceiling."""
+
+def is_large_upload(source):
+    """Whether an upload (path or object with a .name) is above STREAM_THRESHOLD_MB and must be streamed."""
+    threshold_mb = float(os.environ.get('STREAM_THRESHOLD_MB', DEFAULT_STREAM_THRESHOLD_MB))
+    return os.path.getsize(getattr(source, 'name', source)) > threshold_mb * 1024 ** 2
+
+def matrix_memory_limit_mb():
+    """MATRIX_MEMORY_LIMIT_MB as a number, or None when the ceiling is disabled (0)."""
+    limit_mb = float(os.environ.get('MATRIX_MEMORY_LIMIT_MB', DEFAULT_MEMORY_LIMIT_MB))
+    return limit_mb if limit_mb > 0 else None
+
+class ReaderMemory:
+    """Bytes held by the buffers of one matrix read, checked against the server's ceiling."""
+    
+    def __init__(self, sheet_name):
+        self.sheet_name = sheet_name
+        self.limit_mb = matrix_memory_limit_mb()
+        self.peak_mb = 0.0
+    
+    def check(self, rows_read, allocated_bytes):
+        allocated_mb = allocated_bytes / 1024 ** 2
+        self.peak_mb = max(self.peak_mb, allocated_mb)
+        if self.limit_mb is not None and allocated_mb > self.limit_mb:
+            raise MemoryLimitExceeded(
+                f"Reading '{self.sheet_name}' exceeded the memory limit of {self.limit_mb:.0f} MB "
+                f"after {rows_read} rows ({allocated_mb:.0f} MB of buffers)"
+            )
+
+def iter_matrix_rows(source, sheet_name):
+    """Yield the rows of a workbook sheet, header first, without loading the whole file.
+    
+    `source` is a path, or an uploaded file object with a .name.
+    """
+    workbook = load_workbook(getattr(source, 'name', source), read_only=True, data_only=True)
+    try:
+        yield from workbook[sheet_name].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def read_header(rows):
+    """Column labels from the header row, dropping the index cell and trailing blanks."""
+    columns = list(next(rows, ())[1:])
+    while columns and columns[-1] in (None, ''):
+        columns.pop()
+    return columns
+
+def is_blank(row):
+    return not row or all(value in (None, '') for value in row)
+
+def read_sparse_coverage(source, sheet_name='coverage'):
+    """Stream a binary matrix into a CSR boolean matrix.
+    
+    Returns (matrix, row labels, column labels, peak MB of the read's buffers).
+    A cell counts as covered when its value is greater than 0.5, like the dense reader.
+    """
+    memory = ReaderMemory(sheet_name)
+    rows = iter_matrix_rows(source, sheet_name)
+    columns = read_header(rows)
+    num_columns = len(columns)
+    
+    index = []
+    label_bytes = sys.getsizeof(index)
+    indices = array('i')
+    indptr = array('q', [0])
+    for row in rows:
+        if is_blank(row):
+            continue
+        index.append(row[0])
+        label_bytes += sys.getsizeof(row[0]) + 8
+        for col, value in enumerate(row[1:num_columns + 1]):
+            if value not in (None, '') and float(value) > 0.5:
+                indices.append(col)
+        indptr.append(len(indices))
+        if len(index) % MEMORY_CHECK_INTERVAL == 0:
+            memory.check(len(index), label_bytes + len(indices) * indices.itemsize + len(indptr) * indptr.itemsize)
+    
+    # scipy wants indices and indptr of the same dtype; int32 unless there are 2**31 nonzeros
+    indptr = np.frombuffer(indptr, dtype=np.int64)
+    if len(indices) < 2 ** 31:
+        indptr = indptr.astype(np.int32)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), np.frombuffer(indices, dtype=np.int32), indptr),
+        shape=(len(index), num_columns),
+    )
+    memory.check(len(index), label_bytes + matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+    return matrix, index, columns, memory.peak_mb
+
+def read_dense_costs(source, sheet_name='costs', dtype=np.float32):
+    """Stream a numeric matrix into a float32 array (blank cells become NaN).
+    
+    Returns (array, row labels, column labels, peak MB of the read's buffers).
+    """
+    memory = ReaderMemory(sheet_name)
+    rows = iter_matrix_rows(source, sheet_name)
+    columns = read_header(rows)
+    num_columns = len(columns)
+    
+    index = []
+    label_bytes = sys.getsizeof(index)
+    values = np.empty((MEMORY_CHECK_INTERVAL, num_columns), dtype=dtype)
+    for row in rows:
+        if is_blank(row):
+            continue
+        if len(index) == values.shape[0]:
+            # Grow in place by 1.5x rather than collecting rows and stacking them,
+            # checking the ceiling before the larger buffer is allocated
+            grown_rows = len(index) * 3 // 2
+            memory.check(len(index), label_bytes + grown_rows * num_columns * values.itemsize)
+            values.resize((grown_rows, num_columns), refcheck=False)
+        cells = row[1:num_columns + 1]
+        values[len(index)] = np.nan
+        values[len(index), :len(cells)] = [np.nan if value in (None, '') else float(value) for value in cells]
+        index.append(row[0])
+        label_bytes += sys.getsizeof(row[0]) + 8
+    
+    values.resize((len(index), num_columns), refcheck=False)
+    memory.check(len(index), label_bytes + values.nbytes)
+    return values, index, columns, memory.peak_mb